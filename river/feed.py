@@ -1,30 +1,50 @@
 import os
 import re
-import time
 import uuid
 import math
 import json
-import yaml
-import arrow
+import Queue
+import hashlib
 import urllib
 import socket
 import random
 import logging
 import operator
-import requests
-import feedparser
+import threading
 
 from xml.etree import ElementTree
 from collections import deque, Counter
-from datetime import timedelta
 from .item import Item
 from . import __version__
 from .index import Index
-from .utils import (seconds_in_timedelta, format_timestamp, seconds_until, seconds_since)
+from .utils import (format_timestamp, seconds_until, seconds_since, now, deep_sizeof, sleep, strftime,
+                    atomic_write)
 
 logger = logging.getLogger(__name__)
 
-download_exceptions = (requests.exceptions.RequestException, socket.error)
+def download_exceptions():
+    """
+    Return the exceptions that signal a failed download.
+
+    requests is imported here rather than at the top of the module
+    so startup doesn't pay for it until the first feed is fetched.
+    """
+    import requests
+    return (requests.exceptions.RequestException, socket.error)
+
+class RawBody(object):
+    """
+    Hand feedparser a body as undecoded bytes.
+
+    feedparser reads file-like objects directly instead of first trying
+    the string as a filename or URL. The body is returned as-is rather
+    than copied.
+    """
+    def __init__(self, body):
+        self.body = body
+
+    def read(self):
+        return self.body
 
 class Feed(object):
     # check feeds no more/at least this often (in seconds)
@@ -43,20 +63,58 @@ class Feed(object):
     # max number of items to store on first check
     initial_limit = 5
 
-    # use this as timestamp during initial check
-    started = arrow.utcnow()
+    # use this as timestamp during initial check (set by main())
+    started = None
 
     # this is true once all the initial checks are done
     running = False
 
+    # while true, updates are written but the HTML isn't re-rendered
+    deferred = False
+
+    # serializes archive writes when feeds are checked concurrently
+    write_lock = threading.Lock()
+
+    # (archive JSON path, update) pairs waiting to be committed, oldest first
+    pending = []
+
+    # when the oldest pending update was queued
+    pending_since = None
+
+    # commit pending updates at least this often (in seconds)
+    commit_window = 60
+
     # generates the index and archive pages
     index = None
 
-    def __init__(self, url, title=None):
+    # when true, only keep what's needed between checks
+    lean = False
+
+    # response headers kept between checks in lean mode
+    validators = ('etag', 'last-modified')
+
+    # scheduling priority classes, most urgent first
+    priorities = ('high', 'normal', 'low')
+
+    # seconds to check ahead of a max staleness deadline (set by FeedList)
+    slack = 0
+
+    # where the last successfully downloaded body of each feed is kept
+    cache_root = '~/.river/cache/'
+
+    # captures every fetch when set (see river.replay)
+    recorder = None
+
+    # serves fetches from a recorded corpus instead of the network
+    corpus = None
+
+    def __init__(self, url, title=None, **hints):
         self.url = url
         self.title = title
+        self.schedule(**hints)
         self.last_checked = None
         self.headers = {}
+        self.content_type = None
         self.failed = False
         self.timestamps = []
         self.random_interval = self.generate_random_interval()
@@ -101,18 +159,14 @@ class Feed(object):
         """
         Return the average number of seconds between feed items.
         """
-        if self.failed or not self.has_timestamps:
+        if self.failed or not self.has_timestamps or not self.timestamps:
             return self.default_update_interval
 
+        # The gaps between consecutive timestamps sum to the distance
+        # between the newest and the oldest.
         timestamps = sorted(self.timestamps, reverse=True)[:self.window]
-        delta = timedelta()
-        active = timestamps.pop(0)
-        for timestamp in timestamps:
-            delta += (active - timestamp)
-            active = timestamp
-        interval = delta / (len(timestamps) + 1)
-
-        seconds = seconds_in_timedelta(interval)
+        seconds = (timestamps[0] - timestamps[-1]) // len(timestamps)
+
         return seconds if seconds > 0 else self.default_update_interval
 
     def update_interval(self):
@@ -122,11 +176,47 @@ class Feed(object):
         seconds = self.item_interval()
 
         if seconds < self.min_update_interval:
-            return timedelta(seconds=self.min_update_interval)
+            interval = self.min_update_interval
         elif seconds > self.max_update_interval:
-            return timedelta(seconds=self.random_interval)
+            interval = self.random_interval
         else:
-            return timedelta(seconds=seconds)
+            interval = seconds
+
+        if self.max_staleness is not None:
+            # Leave room to wait for a fetch slot, but never more than
+            # half the allowed staleness.
+            interval = min(interval, max(self.max_staleness - self.slack, self.max_staleness // 2))
+
+        return interval
+
+    def schedule(self, priority=None, min_update=None, max_update=None, max_staleness=None):
+        """
+        Apply the scheduling hints given for this feed in the feed list.
+
+        Intervals are in minutes, same as --min-update and
+        --max-update. Hints that aren't provided fall back to the
+        class-wide defaults.
+
+        `max_staleness` is the longest this feed may go between checks.
+        """
+        if priority not in self.priorities:
+            if priority is not None:
+                logger.warning('Unknown priority %r for %s, using normal' % (priority, self.url))
+            priority = 'normal'
+        self.priority = priority
+
+        # Instance attributes shadow the class-wide defaults set in main()
+        for name, minutes in [('min_update_interval', min_update), ('max_update_interval', max_update)]:
+            if minutes is not None:
+                setattr(self, name, minutes * 60)
+            else:
+                self.__dict__.pop(name, None)
+
+        self.max_staleness = max_staleness * 60 if max_staleness is not None else None
+
+    @property
+    def priority_rank(self):
+        return self.priorities.index(self.priority)
 
     def generate_random_interval(self, minimum=None):
         """
@@ -169,14 +259,24 @@ class Feed(object):
         """
         Return when this feed is due for a check.
 
-        Returns a date far in the past (1/1/1970) if this feed hasn't
-        been checked before. This ensures all feeds are checked upon
-        startup.
+        Returns the epoch (1/1/1970) if this feed hasn't been checked
+        before. This ensures all feeds are checked upon startup.
         """
         if self.last_checked is None:
-            return arrow.Arrow(1970, 1, 1)
+            return 0
         return self.last_checked + self.update_interval()
 
+    @property
+    def deadline(self):
+        """
+        Return when this feed must be checked to honor its max staleness.
+
+        Feeds without a max staleness are due by their next check.
+        """
+        if self.last_checked is None or self.max_staleness is None:
+            return self.next_check
+        return self.last_checked + self.max_staleness
+
     def process_feed(self):
         """
         Return a list of new feed items.
@@ -186,13 +286,13 @@ class Feed(object):
         timestamp descending.
         """
         all_items = list(self)
-        new_items = filter(lambda item: item.fingerprint not in self.fingerprints, all_items)
+        new_items = filter(lambda item: self.fingerprint_key(item) not in self.fingerprints, all_items)
 
-        [self.fingerprints.insert(0, item.fingerprint) for item in reversed(new_items)]
+        [self.fingerprints.insert(0, self.fingerprint_key(item)) for item in reversed(new_items)]
         del self.fingerprints[1000-1:]
 
         logger.debug('Tracking %d fingerprints' % len(self.fingerprints))
-        self.last_checked = arrow.utcnow()
+        self.last_checked = now()
         self.check_count += 1
 
         if self.has_timestamps:
@@ -200,6 +300,17 @@ class Feed(object):
         else:
             return list(reversed(new_items))
 
+    def fingerprint_key(self, item):
+        """
+        Return the value stored in self.fingerprints for item.
+
+        In lean mode this is the 20-byte SHA-1 digest of the
+        fingerprint rather than the (often much longer) GUID.
+        """
+        if self.lean:
+            return hashlib.sha1(item.fingerprint.encode('utf-8')).digest()
+        return item.fingerprint
+
     def update_timestamps(self, items):
         """
         Update self.timestamps with the timestamps from items.
@@ -213,7 +324,7 @@ class Feed(object):
         in-depth explanation of how this works.
         """
         if self.timestamps:
-            logger.debug('Old delay: %d seconds' % seconds_in_timedelta(self.update_interval()))
+            logger.debug('Old delay: %d seconds' % self.update_interval())
             logger.debug('Old latest timestamp: %s' % format_timestamp(self.timestamps[0], web=False))
 
         timestamps = [item.timestamp for item in items if item.timestamp is not None]
@@ -229,7 +340,7 @@ class Feed(object):
         elif not timestamps and not self.failed:
             if self.item_interval() < self.max_update_interval:
                 current_update_interval = self.update_interval()
-                self.timestamps.insert(0, arrow.utcnow())
+                self.timestamps.insert(0, now())
                 if self.update_interval() < current_update_interval:
                     logger.debug('Skipping virtual timestamp as it would shorten the update interval')
                     self.timestamps.pop(0)
@@ -243,7 +354,7 @@ class Feed(object):
 
         if self.timestamps:
             logger.debug('New latest timestamp: %s' % format_timestamp(self.timestamps[0], web=False))
-            logger.debug('New delay: %d seconds' % seconds_in_timedelta(self.update_interval()))
+            logger.debug('New delay: %d seconds' % self.update_interval())
 
     def display_next_check(self):
         logger.debug('Next check: %s (%s)' % (
@@ -251,13 +362,11 @@ class Feed(object):
         ))
 
     def build_update(self, new_items):
-        timestamp = arrow.utcnow() if self.running else self.started
+        timestamp = now() if self.running else (self.started or now())
         update = {
-            'timestamp': str(timestamp),
-            'previous_timestamp': (str(self.previous_timestamp)
-                                   if self.previous_timestamp is not None
-                                   else None),
-            'next_check': str(self.next_check),
+            'timestamp': timestamp,
+            'previous_timestamp': self.previous_timestamp,
+            'next_check': self.next_check,
             'uuid': str(uuid.uuid4()),
             'feed': {
                 'title': self.title or self.parsed.feed.get('title', ''),
@@ -309,6 +418,9 @@ class Feed(object):
         logger.debug('Checked %d time(s)' % self.check_count)
         logger.debug('Processed %d total item(s)' % self.item_count)
 
+        if self.lean:
+            self.parsed = None
+
         self.display_next_check()
 
     @staticmethod
@@ -316,31 +428,115 @@ class Feed(object):
         """
         Return the location of the archive JSON file.
         """
-        p = os.path.join(output, 'json', '%s.json' % arrow.now().format('YYYY-MM-DD'))
+        p = os.path.join(output, 'json', '%s.json' % strftime('%Y-%m-%d'))
         if not os.path.isdir(os.path.dirname(p)):
             os.makedirs(os.path.dirname(p))
         return p
 
-    def write_update(self, update, output):
-        json_path = self.json_path(output)
+    @classmethod
+    def write_update(cls, update, output):
+        """
+        Queue update to be committed along with any others arriving
+        within cls.commit_window seconds.
+        """
+        with cls.write_lock:
+            if not cls.pending:
+                cls.pending_since = now()
+            # Archive by the day the update arrived, not the day it's committed
+            cls.pending.append((cls.json_path(output), update))
+            logger.debug('Queued update %s' % update['uuid'])
 
-        try:
-            with open(json_path) as fp:
-                updates = json.load(fp)
-        except (IOError, ValueError):
-            updates = []
+        cls.commit(output)
 
-        updates.insert(0, update)
+    @classmethod
+    def commit(cls, output, force=False):
+        """
+        Write all pending updates to the archive JSON in one go and
+        re-render the HTML.
 
-        logger.debug('Writing update %s' % update['uuid'])
+        Unless `force` is True, nothing happens until the oldest
+        pending update has waited cls.commit_window seconds.
+        """
+        with cls.write_lock:
+            if not cls.pending:
+                return
+            if not force and seconds_since(cls.pending_since) < cls.commit_window:
+                return
 
-        with open(json_path, 'wb') as fp:
-            json.dump(updates, fp, indent=2, sort_keys=True)
+            pending, cls.pending = cls.pending, []
+            logger.debug('Committing %d update(s)' % len(pending))
 
-        self.updates.appendleft(update)
+            archives = {}
+            for json_path, update in pending:
+                if json_path not in archives:
+                    archives[json_path] = cls.load_archive(json_path)
+                archives[json_path].insert(0, update)
+                cls.add_update(update)
+
+            for json_path, archive in archives.iteritems():
+                atomic_write(json_path, json.dumps(archive, indent=2, sort_keys=True))
+
+            if not cls.deferred:
+                cls.render(output, archives)
+
+    @staticmethod
+    def load_archive(json_path):
+        """
+        Return the updates in the archive JSON file.
+
+        An unreadable archive is moved aside rather than overwritten.
+        """
+        if not os.path.isfile(json_path):
+            return []
+
+        try:
+            with open(json_path) as fp:
+                return json.load(fp)
+        except ValueError:
+            corrupt_path = '%s.corrupt' % json_path
+            logger.error('Could not parse %s, moving it to %s' % (json_path, corrupt_path))
+            os.rename(json_path, corrupt_path)
+            return []
+
+    @classmethod
+    def add_update(cls, update):
+        """
+        Add an update for the index, keeping the index's ranking in step
+        with updates falling off the end of cls.updates.
+        """
+        if cls.lean:
+            update = cls.slim_update(update)
+        if len(cls.updates) == cls.updates.maxlen:
+            cls.index.discard(cls.updates[-1])
+        cls.updates.appendleft(update)
+        cls.index.insert(update)
 
-        self.index.write_archive(json_path)
-        self.index.write_index(self.updates)
+    @staticmethod
+    def slim_update(update):
+        """
+        Return a copy of update with only the fields the index uses.
+        """
+        slim = dict((key, update[key]) for key in ('timestamp', 'uuid', 'initial_check') if key in update)
+        slim['feed'] = dict((key, update['feed'][key]) for key in ('title', 'web_url', 'feed_url', 'interval'))
+        slim['feed_items'] = [dict((key, value) for key, value in item.iteritems() if key != 'guid')
+                              for item in update['feed_items']]
+        return slim
+
+    @classmethod
+    def render(cls, output, archives=None):
+        """
+        Re-render the index and the archive page for each archive JSON
+        path in `archives` (mapped to its updates), defaulting to
+        today's.
+        """
+        if archives is None:
+            json_path = cls.json_path(output)
+            archives = {json_path: cls.load_archive(json_path)}
+        for json_path, archive in archives.iteritems():
+            if archive:
+                date = os.path.splitext(os.path.basename(json_path))[0]
+                cls.index.write_archive(archive, date)
+        cls.index.write_index()
 
     def parse(self):
         """
@@ -348,16 +544,24 @@ class Feed(object):
 
         If there was an error downloading the feed, return None.
         """
+        import feedparser
+
         try:
-            content = self.download()
-        except download_exceptions:
+            body = self.download()
+        except download_exceptions():
             return None
-        else:
-            return feedparser.parse(content)
-            
+
+        # The declared Content-Type lets feedparser pick the encoding
+        # per RFC 3023, so the body is only ever decoded here.
+        response_headers = {}
+        if self.content_type:
+            response_headers['content-type'] = self.content_type
+
+        return feedparser.parse(RawBody(body), response_headers=response_headers)
+
     def download(self):
         """
-        Return the raw feed body.
+        Return the raw feed body as bytes.
 
         Sends a conditional GET request to save some bandwidth.
         """
@@ -376,41 +580,67 @@ class Feed(object):
         })
 
         try:
-            response = requests.get(self.url, headers=headers, timeout=15, verify=False)
+            response = self.fetch(headers)
             response.raise_for_status()
-        except download_exceptions:
+        except download_exceptions() as e:
             logger.exception('Failed to download %s' % self.url)
+            if self.recorder is not None:
+                self.recorder.record(self.url, getattr(e, 'response', None))
             self.failed = True
             raise
         else:
+            if self.recorder is not None:
+                self.recorder.record(self.url, response)
             self.failed = False
 
         logger.debug('Status code: %d' % response.status_code)
 
-        self.headers.update(response.headers)
+        if self.lean:
+            for key in self.validators:
+                if response.headers.get(key):
+                    self.headers[key] = response.headers[key]
+        else:
+            self.headers.update(response.headers)
 
         if response.status_code != 304:
             logger.debug('Last-Modified: %s' % self.headers.get('last-modified'))
             logger.debug('ETag: %s' % self.headers.get('etag'))
 
         if response.status_code == 200:
-            self.payload = response.text
-            return response.text
+            self.content_type = response.headers.get('content-type')
+            self.payload = response.content
+            return response.content
         else:
             return self.payload
 
+    def fetch(self, headers):
+        """
+        Return the response to a GET request for this feed.
+
+        When a replay corpus is loaded, the response comes from it
+        rather than the network.
+        """
+        if self.corpus is not None:
+            return self.corpus.get(self.url, headers, early=not self.running)
+
+        import requests
+        return requests.get(self.url, headers=headers, timeout=15, verify=False)
+
     @property
     def payload(self):
-        with open(self.cache_path()) as fp:
-            return fp.read().decode('utf-8')
+        """
+        Return the cached body as bytes.
+        """
+        with open(self.cache_path(), 'rb') as fp:
+            return fp.read()
 
     @payload.setter
     def payload(self, body):
-        with open(self.cache_path(), 'w') as fp:
-            fp.write(body.encode('utf-8'))
+        with open(self.cache_path(), 'wb') as fp:
+            fp.write(body)
 
     def cache_path(self):
-        cache_root = os.path.expanduser('~/.river/cache/')
+        cache_root = os.path.expanduser(self.cache_root)
 
         if not os.path.isdir(cache_root):
             os.makedirs(cache_root)
@@ -420,24 +650,41 @@ class Feed(object):
 class FeedList(object):
     logger = logging.getLogger(__name__ + '.list')
 
-    def __init__(self, feed_list):
+    # feed list attribute names for each scheduling hint
+    opml_hints = {
+        'priority': 'priority',
+        'min_update': 'minUpdate',
+        'max_update': 'maxUpdate',
+        'max_staleness': 'maxStaleness',
+    }
+
+    def __init__(self, feed_list, budget=0):
         self.feed_list = feed_list
         self.feeds = self.parse(feed_list)
-        self.last_checked = arrow.utcnow()
+        self.last_checked = now()
         random.shuffle(self.feeds)
 
+        # max number of feed requests per minute (0 for no limit)
+        self.budget = budget
+        self.budget_lock = threading.Lock()
+        self.last_fetch = None
+        self.reserve_slack()
+
+        self.lag = dict((priority, Counter()) for priority in Feed.priorities)
+
     def parse(self, path):
         """
         Return a list of Feed objects from the feed list.
         """
         if re.search('^https?://', path):
+            import requests
             while True:
                 try:
                     response = requests.get(path, timeout=15, verify=False)
                     response.raise_for_status()
-                except download_exceptions:
+                except download_exceptions():
                     self.logger.exception('Failed to download feed list, trying again in 60 seconds')
-                    time.sleep(60)
+                    sleep(60)
                 else:
                     content = response.content
                     break
@@ -450,7 +697,7 @@ class FeedList(object):
         else:
             doc = self.parse_yaml(content)
 
-        self.last_checked = arrow.utcnow()
+        self.last_checked = now()
 
         feeds = []
         feed_counter = Counter()
@@ -472,26 +719,52 @@ class FeedList(object):
         parsed = ElementTree.fromstring(content)
         for outline in parsed.iter('outline'):
             if outline.get('type') == 'rss' and outline.get('xmlUrl'):
-                yield {
+                obj = {
                     'url': outline.get('xmlUrl'),
                     'title': outline.get('title') or outline.get('text'),
                 }
+                obj.update(self.parse_hints(outline, self.opml_hints))
+                yield obj
 
     def parse_yaml(self, content):
+        import yaml
         parsed = yaml.load(content)
         for obj in parsed:
             if isinstance(obj, str):
                 yield {'url': obj}
 
             elif isinstance(obj, dict):
-                yield {
+                info = {
                     'url': obj['url'],
                     'title': obj.get('title'),
                 }
+                info.update(self.parse_hints(obj))
+                yield info
+
+    def parse_hints(self, obj, names=None):
+        """
+        Return the scheduling hints found in obj.
+
+        `names` maps each hint to the attribute it's stored under,
+        defaulting to the hint's own name.
+        """
+        hints = {}
+        for hint in ('priority', 'min_update', 'max_update', 'max_staleness'):
+            value = obj.get((names or {}).get(hint, hint))
+            if value is None:
+                continue
+            if hint == 'priority':
+                hints[hint] = str(value).lower()
+                continue
+            try:
+                hints[hint] = int(value)
+            except (TypeError, ValueError):
+                self.logger.warning('Ignoring invalid %s %r' % (hint, value))
+        return hints
 
     def refresh_feed(self, f, info):
         """
-        Catch updates to a feed's title.
+        Catch updates to a feed's title and scheduling hints.
 
         This works by searching self.feeds for the given Feed object
         and setting the title attribute based on what was passed.
@@ -504,13 +777,138 @@ class FeedList(object):
         else:
             feed.title = info.get('title')
 
+            bounds = (feed.min_update_interval, feed.max_update_interval)
+            feed.schedule(**dict((key, value) for key, value in info.iteritems()
+                                 if key in self.opml_hints))
+            if (feed.min_update_interval, feed.max_update_interval) != bounds:
+                feed.random_interval = feed.generate_random_interval()
+
     def active(self):
         """
         Return the next feed to be checked.
+
+        Feeds that have never been checked go first, so the first
+        river is complete before anything is checked again. After that,
+        when several feeds are due, higher priority classes go first
+        and within a class the feed with the earliest deadline wins.
         """
         assert self.feeds, 'no feeds to check!'
-        self.feeds = sorted(self.feeds, key=operator.attrgetter('next_check'))
-        return self.feeds[0]
+        unchecked = [feed for feed in self.feeds if feed.last_checked is None]
+        if unchecked:
+            return min(unchecked, key=operator.attrgetter('priority_rank'))
+
+        current = now()
+        due = [feed for feed in self.feeds if feed.next_check <= current]
+        if due:
+            return min(due, key=lambda feed: (feed.priority_rank, feed.deadline))
+        return min(self.feeds, key=operator.attrgetter('next_check'))
+
+    def budget_delay(self):
+        """
+        Return how many seconds to wait before the next request so as
+        to stay within self.budget requests per minute.
+        """
+        if not self.budget or self.last_fetch is None:
+            return 0
+        return max(0, self.last_fetch + 60.0 / self.budget - now(precise=True))
+
+    def check(self, feed, output):
+        """
+        Check feed, spending one request from the budget and recording
+        how late the check was for the feed's priority class.
+        """
+        with self.budget_lock:
+            delay = self.budget_delay()
+            if delay:
+                sleep(delay)
+            self.last_fetch = now(precise=True)
+
+        if not feed.initial_check:
+            current = now()
+            stats = self.lag[feed.priority]
+            lag = max(0, current - feed.next_check)
+            stats['checks'] += 1
+            stats['lag'] += lag
+            stats['max_lag'] = max(stats['max_lag'], lag)
+            if feed.max_staleness is not None and current > feed.deadline:
+                stats['missed'] += 1
+
+        feed.check(output)
+
+    def lag_report(self):
+        """
+        Return a list of (priority, checks, average lag, max lag, missed
+        deadlines) tuples for each priority class checked so far.
+        """
+        report = []
+        for priority in Feed.priorities:
+            stats = self.lag[priority]
+            if stats['checks']:
+                report.append((priority, stats['checks'], stats['lag'] / stats['checks'],
+                               stats['max_lag'], stats['missed']))
+        return report
+
+    def initial_pass(self, output, workers=10, budget=None):
+        """
+        Check every feed that hasn't been checked yet using a pool of
+        worker threads.
+
+        Rendering is deferred until the pass is over so each update
+        doesn't trigger a full re-render of the index.
+
+        If `budget` (in seconds) is provided, workers stop picking up
+        new feeds once it elapses. Anything left over is checked by the
+        main loop as usual.
+
+        Returns the number of feeds checked.
+        """
+        pending = Queue.Queue()
+        for feed in self.feeds:
+            if feed.initial_check:
+                pending.put(feed)
+
+        total = pending.qsize()
+        deadline = now(precise=True) + budget if budget else None
+        checked = Counter()
+        checked_lock = threading.Lock()
+
+        def work():
+            while deadline is None or now(precise=True) < deadline:
+                try:
+                    feed = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                self.logger.info('Checking feed: %s' % feed.url)
+                try:
+                    self.check(feed, output)
+                except Exception:
+                    self.logger.exception('Failed to check %s' % feed.url)
+                with checked_lock:
+                    checked['feeds'] += 1
+
+        self.logger.info('Starting initial pass of %d feeds with %d workers' % (total, workers))
+        start = now(precise=True)
+        Feed.deferred = True
+
+        threads = [threading.Thread(target=work) for _ in xrange(workers)]
+        try:
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            # join with a timeout so KeyboardInterrupt is still delivered
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(1)
+            Feed.commit(output, force=True)
+        finally:
+            Feed.deferred = False
+
+        Feed.render(output)
+
+        self.logger.info('Initial pass checked %d of %d feeds in %d seconds' % (
+            checked['feeds'], total, now(precise=True) - start))
+
+        return checked['feeds']
 
     def update(self):
         """
@@ -534,6 +932,35 @@ class FeedList(object):
         if not new_feeds and not removed_feeds:
             self.logger.debug('No updates to feed list')
 
+        self.reserve_slack()
+
+    def reserve_slack(self):
+        """
+        Bring forward the checks of feeds with a max staleness so they
+        make their deadline even when every feed of the same or higher
+        priority is waiting on the budget at the same time.
+        """
+        spacing = 60.0 / self.budget if self.budget else 0
+        ranks = Counter(feed.priority_rank for feed in self.feeds)
+        for feed in self.feeds:
+            ahead = sum(count for rank, count in ranks.iteritems() if rank <= feed.priority_rank)
+            feed.slack = int(math.ceil(ahead * spacing))
+
+    def memory_report(self):
+        """
+        Return a list of (structure, bytes) pairs estimating how much
+        memory each part of the per-feed and global state is using.
+        """
+        seen = set()
+        report = []
+        for name in ('parsed', 'headers', 'fingerprints', 'timestamps'):
+            size = sum(deep_sizeof(getattr(feed, name, None), seen) for feed in self.feeds)
+            report.append(('feed.%s' % name, size))
+        report.append(('Feed.updates', deep_sizeof(Feed.updates, seen)))
+        if Feed.index is not None:
+            report.append(('index ranking', deep_sizeof((Feed.index.runs, Feed.index.ranked), seen)))
+        return report
+
     def need_update(self, interval):
         """
         Return True if the feed list is due for a check.
@@ -541,5 +968,5 @@ class FeedList(object):
         if seconds_since(self.last_checked) >= interval:
             return True
 
-        next_check = self.last_checked + timedelta(seconds=interval)
+        next_check = self.last_checked + interval
         self.logger.debug('Next feed list check in %s' % seconds_until(next_check, readable=True))
@@ -1,47 +1,98 @@
 import os
-import json
-import arrow
-import jinja2
-from .utils import format_timestamp, seconds_since
+import heapq
+import bisect
+import itertools
+from .utils import format_timestamp, now, atomic_write
 
 class Index(object):
     def __init__(self, output, strict, hours=4):
         self.output = output
         self.strict = strict
         self.hours = hours
+        self._template = None
 
-        self.environment = jinja2.Environment(loader=jinja2.PackageLoader('river'))
-        self.environment.filters['format_timestamp'] = format_timestamp
-        self.template = self.environment.get_template('index.html')
+        # Ranked updates, grouped by factor. Within a group, ordering
+        # by timestamp never changes, so each group is kept sorted
+        # newest first and the groups are merged at render time.
+        self.runs = {}
+        self.ranked = {}
+        self.sequence = itertools.count()
 
-    def write_archive(self, json_path):
-        archive = os.path.join(self.output, arrow.now().format('YYYY/MM/DD'))
+    @property
+    def template(self):
+        """
+        Return the page template, loading jinja2 on first use.
+        """
+        if self._template is None:
+            import jinja2
+            environment = jinja2.Environment(loader=jinja2.PackageLoader('river'))
+            environment.filters['format_timestamp'] = format_timestamp
+            self._template = environment.get_template('index.html')
+        return self._template
+
+    def write_archive(self, updates, date):
+        """
+        Write the archive page for `date` (YYYY-MM-DD).
+        """
+        archive = os.path.join(self.output, *date.split('-'))
         if not os.path.isdir(archive):
             os.makedirs(archive)
 
         filename = os.path.join(archive, 'index.html')
-
-        with open(json_path) as json_fp:
-            updates = json.load(json_fp)
-
-        with open(filename, 'w') as html_fp:
-            body = self.template.render(updates=updates).encode('utf-8')
-            html_fp.write(body)
+        atomic_write(filename, self.template.render(updates=updates).encode('utf-8'))
 
     def factor_update(self, update):
-        age = seconds_since(update['timestamp'])
+        """
+        Return the number an update's age is divided by when ranking it.
 
+        Updates from feeds that post less often than every `self.hours`
+        hours age more slowly so they stay near the top longer.
+        """
         if 'initial_check' in update or self.strict:
-            return age
+            return 1
 
         interval = update['feed']['interval']
-        factor = max(1.0, interval / (self.hours * 60 ** 2.0))
+        return max(1.0, interval / (self.hours * 60 ** 2.0))
+
+    def insert(self, update):
+        """
+        Add an update to the ranking.
+
+        Among equally ranked updates, the most recently inserted comes
+        first.
+        """
+        factor = self.factor_update(update)
+        entry = (-update['timestamp'], -next(self.sequence), update)
+        bisect.insort(self.runs.setdefault(factor, []), entry)
+        self.ranked[update['uuid']] = (factor, entry)
+
+    def discard(self, update):
+        """
+        Remove an update from the ranking, if present.
+        """
+        try:
+            factor, entry = self.ranked.pop(update['uuid'])
+        except KeyError:
+            return
+        run = self.runs[factor]
+        del run[bisect.bisect_left(run, entry)]
+        if not run:
+            del self.runs[factor]
+
+    def ranked_updates(self):
+        """
+        Return the ranked updates, lowest factored age first.
+        """
+        current = now()
+
+        def factored(factor, run):
+            for timestamp, sequence, update in run:
+                yield ((current + timestamp) / factor, sequence, update)
 
-        return age / factor
+        runs = [factored(factor, run) for factor, run in self.runs.iteritems()]
+        return [update for _, _, update in heapq.merge(*runs)]
 
-    def write_index(self, updates):
+    def write_index(self):
         filename = os.path.join(self.output, 'index.html')
-        updates = sorted(updates, key=self.factor_update)
-        with open(filename, 'w') as html_fp:
-            body = self.template.render(updates=updates).encode('utf-8')
-            html_fp.write(body)
+        updates = self.ranked_updates()
+        atomic_write(filename, self.template.render(updates=updates).encode('utf-8'))
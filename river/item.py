@@ -1,12 +1,19 @@
-import arrow
-import bleach
+import calendar
 import hashlib
-from datetime import datetime, timedelta
+from datetime import timedelta
+from .utils import now
+
+# marks a timestamp that hasn't been computed yet (None is a valid result)
+unset = object()
 
 class Item(object):
+    # timestamps before 1/1/2000 are considered bogus
+    earliest_timestamp = 946684800
+
     def __init__(self, item):
         self.item = item
-        self.created = arrow.utcnow()
+        self.created = now()
+        self._timestamp = unset
 
     def __eq__(self, other):
         return self.fingerprint == other.fingerprint
@@ -18,6 +25,7 @@ class Item(object):
         return hash(self.fingerprint)
 
     def clean_text(self, text, limit=280, suffix=u'\u2026'):
+        import bleach
         cleaned = bleach.clean(text, tags=[], strip=True).strip()
         if len(cleaned) > limit:
             s = u''.join(cleaned[:limit]).strip()
@@ -29,7 +37,7 @@ class Item(object):
     @property
     def info(self):
         obj = {
-            'timestamp': str(self.timestamp or arrow.Arrow(1970, 1, 1)),
+            'timestamp': self.timestamp or 0,
             'guid': self.item.get('guid', ''),
         }
 
@@ -63,7 +71,7 @@ class Item(object):
         appeared in the feed and when it was first seen.
         """
         if self.timestamp is not None:
-            return self.created - self.timestamp
+            return timedelta(seconds=self.created - self.timestamp)
         else:
             return timedelta(seconds=0)
 
@@ -76,11 +84,21 @@ class Item(object):
 
     @property
     def timestamp(self):
+        """
+        Return the item's timestamp in seconds since the epoch.
+
+        Computed once per item as it's used for every sort and interval
+        calculation.
+        """
+        if self._timestamp is unset:
+            self._timestamp = self.reported_timestamp()
+        return self._timestamp
+
+    def reported_timestamp(self):
         for key in ['published_parsed', 'updated_parsed', 'created_parsed']:
             if not self.item.get(key): continue
-            val = (self.item[key])[:6]
-            reported_timestamp = arrow.get(datetime(*val))
-            if arrow.Arrow(2000, 1, 1) > reported_timestamp:
+            reported_timestamp = calendar.timegm(self.item[key])
+            if reported_timestamp < self.earliest_timestamp:
                 # If pre-2000, consider it bogus
                 return None
             elif reported_timestamp < self.created:
@@ -1,11 +1,12 @@
 import os
-import time
-import arrow
+import random
 import logging
 import argparse
-from .utils import seconds_until, seconds_since, format_timestamp
+from . import utils
+from .utils import seconds_until, seconds_since, format_timestamp, now, sleep
 from .feed import FeedList, Feed
 from .index import Index
+from .replay import Recorder, Corpus, VirtualClock, ScaledClock
 
 logger = logging.getLogger('river')
 
@@ -18,6 +19,18 @@ def main():
     parser.add_argument('--hours', default=4, type=int)
     parser.add_argument('-r', '--refresh', default=15, type=int)
     parser.add_argument('-o', '--output', default='output')
+    parser.add_argument('-f', '--fast-start', action='store_true')
+    parser.add_argument('-w', '--workers', default=10, type=int)
+    parser.add_argument('--start-budget', default=0, type=int)
+    parser.add_argument('--lean', action='store_true')
+    parser.add_argument('--memory-report', action='store_true')
+    parser.add_argument('-b', '--budget', default=0, type=int)
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument('--record')
+    traffic.add_argument('--replay')
+    parser.add_argument('--speed', default=0, type=int)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('-c', '--commit-window', default=60, type=int)
     parser.add_argument('feeds')
     args = parser.parse_args()
 
@@ -27,39 +40,93 @@ def main():
     if not os.path.isdir(args.output):
         os.makedirs(args.output)
 
+    if args.replay:
+        Feed.corpus = Corpus(args.replay)
+        # Feed order and check intervals are shuffled, so seed them
+        # for a replay to pick the same feeds in the same order.
+        random.seed(Feed.corpus.start if args.seed is None else args.seed)
+        Feed.cache_root = os.path.join(args.replay, 'cache')
+        if args.speed:
+            utils.clock = ScaledClock(Feed.corpus.start, args.speed)
+        else:
+            utils.clock = VirtualClock(Feed.corpus.start)
+    elif args.record:
+        Feed.recorder = Recorder(args.record)
+
+    Feed.started = now()
     Feed.min_update_interval = args.min_update * 60
     Feed.max_update_interval = args.max_update * 60
     Feed.index = Index(args.output, args.strict, args.hours)
+    Feed.lean = args.lean
+    Feed.commit_window = args.commit_window
 
-    feeds = FeedList(args.feeds)
+    feeds = FeedList(args.feeds, args.budget)
     active_feed = None
 
     if os.path.isfile(Feed.json_path(args.output)):
         os.remove(Feed.json_path(args.output))
 
     try:
+        if args.fast_start:
+            feeds.initial_pass(args.output, args.workers, args.start_budget * 60)
+
         while True:
+            if Feed.corpus is not None and Feed.corpus.finished():
+                logger.info('Reached the end of the replay corpus')
+                Feed.commit(args.output, force=True)
+                log_lag_report(feeds)
+                break
+
             if active_feed is not None:
                 logger.info('Checking feed: %s' % active_feed.url)
-                active_feed.check(args.output)
+                feeds.check(active_feed, args.output)
+
+            Feed.commit(args.output)
 
             if feeds.need_update(args.refresh * 60):
                 feeds.update()
+                log_lag_report(feeds)
+                if args.memory_report:
+                    log_memory_report(feeds)
 
             active_feed = feeds.active()
 
-            if not active_feed.initial_check:
-                logger.info('Next feed to be checked: %s at %s (%s)' % (
-                    active_feed.url, format_timestamp(active_feed.next_check, web=False),
-                    seconds_until(active_feed.next_check, readable=True),
-                ))
+            # Once every feed has been checked, the first river is complete.
+            if not Feed.running and all(feed.last_checked is not None for feed in feeds.feeds):
+                logger.info('First complete river after %s' % seconds_since(Feed.started, readable=True))
+                Feed.running = True
 
-                delay = seconds_until(active_feed.next_check)
+            # Feeds that have never been checked go right away, but a
+            # feed whose first check failed waits like any other.
+            if active_feed.last_checked is not None:
+                delay = max(seconds_until(active_feed.next_check), feeds.budget_delay())
                 if delay:
-                    time.sleep(delay)
+                    # Don't leave updates waiting through a long sleep
+                    if delay >= Feed.commit_window:
+                        Feed.commit(args.output, force=True)
 
-                # Once here, all the initial checks have been completed.
-                Feed.running = True
+                    logger.info('Next feed to be checked: %s at %s (%s)' % (
+                        active_feed.url, format_timestamp(active_feed.next_check, web=False),
+                        seconds_until(active_feed.next_check, readable=True),
+                    ))
+                    sleep(delay)
+
+                    # More feeds may have come due while sleeping, so
+                    # pick again rather than checking this one.
+                    active_feed = None
 
     except KeyboardInterrupt:
+        Feed.commit(args.output, force=True)
+        if args.memory_report:
+            log_memory_report(feeds)
         print '\nQuitting...'
+
+def log_lag_report(feeds):
+    for priority, checks, average, maximum, missed in feeds.lag_report():
+        logger.info('%s priority: %d check(s), %d seconds average lag, %d seconds max lag, %d missed deadline(s)' % (
+            priority, checks, average, maximum, missed))
+
+def log_memory_report(feeds):
+    logger.info('Memory usage for %d feeds:' % len(feeds.feeds))
+    for name, size in feeds.memory_report():
+        logger.info('  %-20s %10.1f KB' % (name, size / 1024.0))
@@ -0,0 +1,195 @@
+import os
+import json
+import zlib
+import bisect
+import hashlib
+import logging
+import threading
+
+from collections import defaultdict
+from .utils import Clock, now
+
+logger = logging.getLogger(__name__)
+
+# response headers captured with each fetch
+captured_headers = ('etag', 'last-modified', 'content-type')
+
+class Recorder(object):
+    """
+    Append every feed fetch to a corpus directory.
+
+    Each fetch is a line of JSON in fetches.jsonl holding the URL,
+    time, status code and captured headers. Bodies are stored once
+    per distinct SHA-1 digest, zlib-compressed, under bodies/.
+
+    A status code of 0 means the request failed without a response.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        if not os.path.isdir(os.path.join(path, 'bodies')):
+            os.makedirs(os.path.join(path, 'bodies'))
+
+    def record(self, url, response=None):
+        fetch = {
+            'url': url,
+            'time': now(),
+            'status': response.status_code if response is not None else 0,
+        }
+
+        if response is not None:
+            for key in captured_headers:
+                if response.headers.get(key):
+                    fetch[key] = response.headers[key]
+
+            if response.status_code == 200:
+                fetch['digest'] = self.store(response.content)
+
+        with self.lock:
+            with open(os.path.join(self.path, 'fetches.jsonl'), 'a') as fp:
+                fp.write(json.dumps(fetch, sort_keys=True) + '\n')
+
+    def store(self, body):
+        """
+        Save body unless it's already in the corpus and return its digest.
+        """
+        digest = hashlib.sha1(body).hexdigest()
+        path = os.path.join(self.path, 'bodies', digest)
+        if not os.path.isfile(path):
+            temp_path = '%s.%d.tmp' % (path, threading.current_thread().ident)
+            with open(temp_path, 'wb') as fp:
+                fp.write(zlib.compress(body))
+            os.rename(temp_path, path)
+        return digest
+
+class Corpus(object):
+    """
+    Serve feed fetches from a corpus written by Recorder.
+
+    Each request gets the latest fetch recorded for that URL at or
+    before the current (replayed) time. Requests made before a URL's
+    first fetch fail as if the network were down, except during the
+    first river: the recorder checked its feeds one after another, so
+    their first fetches are spread out past the start of the corpus.
+    A 304 fetch is served with the body and headers of the 200 fetch
+    before it. The response is a 304 if the request's validators match
+    and the body hasn't changed since it was last served; otherwise
+    it's a 200.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.fetches = defaultdict(list)
+        self.times = defaultdict(list)
+        self.served = {}
+
+        with open(os.path.join(path, 'fetches.jsonl')) as fp:
+            records = sorted((json.loads(line) for line in fp if line.strip()),
+                             key=lambda fetch: fetch['time'])
+
+        previous = {}
+        for fetch in records:
+            url = fetch['url']
+            if fetch['status'] == 304 and url in previous:
+                carried = dict(previous[url])
+                carried.update(fetch)
+                fetch = carried
+            elif fetch['status'] == 200:
+                previous[url] = dict((key, fetch[key]) for key in captured_headers + ('digest',)
+                                     if key in fetch)
+            self.fetches[url].append(fetch)
+            self.times[url].append(fetch['time'])
+
+        if not records:
+            raise ValueError('no fetches recorded in %s' % path)
+
+        self.start = records[0]['time']
+        self.end = records[-1]['time']
+
+        logger.info('Loaded %d fetches of %d feeds from %s' % (len(records), len(self.fetches), path))
+
+    def finished(self):
+        """
+        Return True once the replayed time is past the last fetch.
+        """
+        return now() > self.end
+
+    def get(self, url, headers, early=False):
+        """
+        Return a requests Response for url as it was recorded.
+
+        If `early` is True, a request made before the URL's first fetch
+        is served that fetch rather than failing.
+        """
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+
+        if url not in self.fetches:
+            raise requests.exceptions.ConnectionError('%s was not recorded' % url)
+
+        index = bisect.bisect_right(self.times[url], now()) - 1
+        if index < 0 and early:
+            index = 0
+        elif index < 0:
+            raise requests.exceptions.ConnectionError('%s was not recorded yet' % url)
+        fetch = self.fetches[url][index]
+
+        if not fetch['status']:
+            raise requests.exceptions.ConnectionError('%s failed when recorded' % url)
+
+        response = requests.models.Response()
+        response.url = url
+        response.status_code = fetch['status']
+        response.headers = CaseInsensitiveDict(
+            (key, fetch[key]) for key in captured_headers if key in fetch)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = ''
+
+        if 'digest' in fetch:
+            validated = ((fetch.get('etag') and headers.get('If-None-Match') == fetch['etag']) or
+                         (fetch.get('last-modified') and headers.get('If-Modified-Since') == fetch['last-modified']))
+            if validated and self.served.get(url) == fetch['digest']:
+                response.status_code = 304
+            else:
+                response.status_code = 200
+                response._content = self.body(fetch['digest'])
+                self.served[url] = fetch['digest']
+
+        return response
+
+    def body(self, digest):
+        with open(os.path.join(self.path, 'bodies', digest), 'rb') as fp:
+            return zlib.decompress(fp.read())
+
+class VirtualClock(Clock):
+    """
+    A clock that only moves when slept on, so a replay runs as fast as
+    feeds can be processed.
+    """
+    def __init__(self, start):
+        self.current = start
+        self.lock = threading.Lock()
+
+    def time(self):
+        return self.current
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.current += seconds
+
+class ScaledClock(Clock):
+    """
+    A clock starting at `start` that runs `speed` times faster than
+    the wall clock.
+    """
+    def __init__(self, start, speed):
+        self.start = start
+        self.speed = speed
+        self.real_start = Clock.time(self)
+
+    def time(self):
+        return self.start + (Clock.time(self) - self.real_start) * self.speed
+
+    def sleep(self, seconds):
+        Clock.sleep(self, seconds / float(self.speed))
@@ -1,38 +1,138 @@
 import os
+import sys
 import json
-import arrow
-import requests
+import stat
+import time
+import tempfile
+from collections import deque
 
-def seconds_in_timedelta(delta):
+class Clock(object):
     """
-    Return the number of seconds in the given timedelta.
+    The wall clock. Replay mode swaps in a clock that runs on recorded
+    time instead.
+    """
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+clock = Clock()
 
-    Accounts for the number of days in the delta, too.
+def now(precise=False):
     """
-    return (delta.days * 24 * 60 * 60) + delta.seconds
+    Return the current time as an integer number of seconds since the
+    epoch.
 
-def seconds_until(timestamp, readable=False):
-    if arrow.utcnow() > timestamp:
-        seconds = 0
-    else:
-        seconds = seconds_in_timedelta(timestamp - arrow.utcnow())
+    All scheduling, sorting and serialization works with these
+    integers. arrow is only used when formatting for display.
 
-    if readable:
-        m, s = divmod(seconds, 60)
-        return '%02d:%02d' % (m, s)
-    else:
-        return seconds
+    If `precise` is True, return a float instead.
+    """
+    return clock.time() if precise else int(clock.time())
 
-def seconds_since(timestamp):
+def sleep(seconds):
+    clock.sleep(seconds)
+
+def strftime(format):
+    """
+    Return the current local time formatted with time.strftime.
+    """
+    return time.strftime(format, time.localtime(clock.time()))
+
+def seconds_until(timestamp, readable=False):
+    seconds = max(0, timestamp - now())
+    return readable_seconds(seconds) if readable else seconds
+
+def seconds_since(timestamp, readable=False):
     if isinstance(timestamp, basestring):
-        timestamp = arrow.get(timestamp)
-    return seconds_in_timedelta(arrow.utcnow() - timestamp)
+        timestamp = parse_timestamp(timestamp)
+    seconds = now() - timestamp
+    return readable_seconds(seconds) if readable else seconds
+
+def readable_seconds(seconds):
+    m, s = divmod(seconds, 60)
+    return '%02d:%02d' % (m, s)
+
+def parse_timestamp(timestamp):
+    """
+    Return the epoch seconds for an ISO 8601 timestamp string.
+
+    Only needed for updates written before timestamps were stored as
+    integers.
+    """
+    import arrow
+    return arrow.get(timestamp).timestamp
 
 def format_timestamp(timestamp, web=True, local=True):
-    if isinstance(timestamp, basestring):
-        timestamp = arrow.get(timestamp)
+    import arrow
+    timestamp = arrow.get(timestamp)
 
     if local:
         timestamp = timestamp.to('local')
 
     return timestamp.format('hh:mm A; M/D/YY' if web else 'ddd, DD MMM YYYY HH:mm:ss Z')
+
+def deep_sizeof(obj, seen=None):
+    """
+    Return the approximate number of bytes used by obj and everything
+    it references.
+
+    Objects whose id is in `seen` aren't counted again, so passing the
+    same set across calls avoids double counting shared objects.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.iteritems())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(value, seen) for value in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+# os.umask can only be read by setting it, so do it once at import
+umask = os.umask(0)
+os.umask(umask)
+
+def atomic_write(path, data):
+    """
+    Replace the contents of path with data so readers only ever see
+    the old or the new contents, even if we crash partway through.
+
+    data is written to a temporary file in the same directory, which
+    is fsynced and then renamed over path. The directory is fsynced
+    afterwards so the rename itself is durable.
+
+    The file keeps its current mode, or gets the mode open() would
+    give a new file under the process umask.
+    """
+    if os.path.exists(path):
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    else:
+        mode = 0666 & ~umask
+
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.chmod(temp_path, mode)
+        os.rename(temp_path, path)
+    finally:
+        # only still there if something went wrong
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)